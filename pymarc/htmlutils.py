@@ -1,62 +1,143 @@
-import html
+import logging
+from functools import lru_cache
+from html.entities import codepoint2name
 from typing import Optional
 from unicodedata import normalize
 
+logger = logging.getLogger("pymarc")
+
+# Codepoint ranges of characters that have or are a diacritic, stored as a
+# flat sequence of half-open interval boundaries. Consumed pairwise by
+# _build_diacritic_table at import time to seed the decomposition table;
+# nothing searches these bounds at runtime.
+_DIACRITIC_BOUNDS = (
+    256, 383,  # covers diacritics in Latin Extended-A
+    461, 497,
+    500, 502,
+    504, 540,
+    542, 544,
+    550, 564,
+    768, 902,  # covers combining diacritical marks
+    938, 945,
+    970, 975,
+    979, 981,
+    1024, 1026,  # covers cyrillic compositions
+    1027, 1028,
+    1031, 1032,
+    1036, 1039,
+    1081, 1082,
+    1104, 1106,
+    1107, 1108,
+    1111, 1112,
+    1116, 1119,
+    1142, 1144,
+    1148, 1152,
+    1154, 1162,  # cyrillic combining marks
+    1217, 1219,
+    1232, 1236,
+    1238, 1240,
+    1242, 1248,
+    1250, 1256,
+    1258, 1274,
+    7936, 8191,  # covers most greek compositions
+)  # fmt: skip
+
+
+def _build_diacritic_table() -> dict:
+    """Precompute the decomposed html representation of every character in
+    `_DIACRITIC_BOUNDS`, so the hot path is a single dict lookup."""
+    table = {}
+    bounds = iter(_DIACRITIC_BOUNDS)
+    for start, stop in zip(bounds, bounds):
+        for codepoint in range(start, stop):
+            char = chr(codepoint)
+            decomposed = normalize("NFD", char)
+            if decomposed == char:
+                # NFD quick-check: the character does not actually decompose,
+                # so the plain entity/codepoint path yields the same result
+                continue
+            decomp_buffer = []
+            for decomp_char in decomposed:
+                decomp_val = ord(decomp_char)
+                decomp_html = codepoint2name.get(decomp_val)
+                if decomp_html:
+                    decomp_buffer.append("&" + decomp_html + ";")
+                    continue
+                decomp_buffer.append("&#" + str(decomp_val) + ";")
+            table[char] = "".join(decomp_buffer)
+    return table
+
+
+_DIACRITIC_HTML = _build_diacritic_table()
+
 
 def decompose_diacritics_html(char) -> Optional[str]:
     """Function for detecting if a unicode char has or is a diacritic,
-    and returning decomposed html representation.
+    and returning decomposed html representation, or None when the character
+    does not decompose under NFD.
     This should work for standard unicode Latin, Greek, and Cyrillic diacritics."""
-    unicode_val = ord(char)
-    if not (
-        (unicode_val >= 7936 and unicode_val <= 8190)  # covers most greek compositions
-        or (
-            unicode_val >= 256 and unicode_val <= 382
-        )  # covers diacritics in Latin Extended-A
-        or (unicode_val >= 461 and unicode_val <= 496)
-        or (unicode_val >= 500 and unicode_val <= 501)
-        or (unicode_val >= 504 and unicode_val <= 539)
-        or (unicode_val >= 542 and unicode_val <= 543)
-        or (unicode_val >= 550 and unicode_val <= 563)
-        or (
-            unicode_val >= 768 and unicode_val <= 901
-        )  # covers combining diacritical marks
-        or (unicode_val >= 938 and unicode_val <= 944)
-        or (unicode_val >= 970 and unicode_val <= 974)
-        or (unicode_val >= 979 and unicode_val <= 980)
-        or (unicode_val >= 1024 and unicode_val <= 1025)  # covers cyrillic compositions
-        or (
-            unicode_val == 1027
-            or unicode_val == 1031
-            or unicode_val == 1081
-            or unicode_val == 1107
-            or unicode_val == 1111
-        )
-        or (unicode_val >= 1036 and unicode_val <= 1038)
-        or (unicode_val >= 1104 and unicode_val <= 1105)
-        or (unicode_val >= 1116 and unicode_val <= 1118)
-        or (unicode_val >= 1142 and unicode_val <= 1143)
-        or (unicode_val >= 1148 and unicode_val <= 1151)
-        or (unicode_val >= 1154 and unicode_val <= 1161)  # cyrillic combining marks
-        or (unicode_val >= 1217 and unicode_val <= 1218)
-        or (unicode_val >= 1232 and unicode_val <= 1235)
-        or (unicode_val >= 1238 and unicode_val <= 1239)
-        or (unicode_val >= 1242 and unicode_val <= 1247)
-        or (unicode_val >= 1250 and unicode_val <= 1255)
-        or (unicode_val >= 1258 and unicode_val <= 1273)
-    ):
-        return
-    # decompose character + diacritic
-    norm = normalize("NFD", char)
-    decomp_buffer = []
-    for decomp_char in norm:
-        decomp_val = ord(decomp_char)
-        decomp_html = html.entities.codepoint2name.get(decomp_val)  # type: ignore
-        if decomp_html:
-            decomp_buffer.append("&" + decomp_html + ";")
-            continue
-        decomp_buffer.append("&#" + str(decomp_val) + ";")
-    return "".join(decomp_buffer)
+    return _DIACRITIC_HTML.get(char)
+
+
+def _escape_char(char) -> str:
+    """Return the html representation of a single non-ASCII character."""
+    diacr = decompose_diacritics_html(char)
+    if diacr:
+        return diacr
+    char_val = ord(char)
+    new_char = codepoint2name.get(char_val)
+    if not new_char:
+        new_char = "#" + str(char_val)
+        logger.debug("Representing char %s with codepoint: &%s;", char, new_char)
+    return "&" + new_char + ";"
+
+
+class _EscapeTable(dict):
+    """Translation table for str.translate that computes the html
+    representation of a codepoint on first use and caches it."""
+
+    def __missing__(self, codepoint):
+        if codepoint < 128:
+            # ASCII passes through untouched; cache the identity mapping so
+            # translate never calls back into Python for this codepoint again
+            self[codepoint] = codepoint
+            return codepoint
+        escaped = _escape_char(chr(codepoint))
+        self[codepoint] = escaped
+        return escaped
+
+
+# Eagerly populate the dense region of the table: every named entity and
+# every diacritic decomposition is known at import time, so __missing__ only
+# fires for rare codepoints that need a numeric reference. Diacritic
+# decompositions take precedence over entity names, as in _escape_char.
+_ESCAPE_TABLE = _EscapeTable(
+    {cp: "&" + name + ";" for cp, name in codepoint2name.items() if cp > 127}
+)
+_ESCAPE_TABLE.update(
+    (ord(char), decomposed) for char, decomposed in _DIACRITIC_HTML.items()
+)
+
+
+@lru_cache(maxsize=4096)
+def _escape_cached(text: str) -> str:
+    """Translate `text` and cache the result.
+
+    MARC dumps repeat values heavily (names, publishers, places), so a
+    bounded cache turns most escapes into a single dict hit."""
+    return text.translate(_ESCAPE_TABLE)
+
+
+def _escape_nonascii(text: str) -> str:
+    """Escape a string known to contain non-ASCII characters.
+
+    A single pass through str.translate's C loop fuses detection and
+    replacement; only codepoints not yet in the table fall back to the
+    per-character Python logic in _EscapeTable.__missing__. Long strings
+    skip the cache so it holds only cheap-to-keep entries."""
+    if len(text) > 256:
+        return text.translate(_ESCAPE_TABLE)
+    return _escape_cached(text)
 
 
 def html_escape_unicode(text) -> str:
@@ -64,19 +145,19 @@ def html_escape_unicode(text) -> str:
     Entity names are preferred to codepoints. This handles Greek diacritics specially."""
     if not isinstance(text, str):
         return text
-    buffer = []
-    for char in text:
-        if char.isascii():
-            buffer.append(char)
-            continue
-        diacr = decompose_diacritics_html(char)
-        if diacr:
-            buffer.append(diacr)
-            continue
-        char_val = ord(char)
-        new_char = html.entities.codepoint2name.get(char_val)  # type: ignore
-        if not new_char:
-            new_char = "#" + str(char_val)
-            print(f"Representing char {char} with codepoint: {'&' + new_char + ';'}")
-        buffer.append("&" + new_char + ";")
-    return "".join(buffer)
+    # the common case for MARC data: nothing to escape
+    if text.isascii():
+        return text
+    return _escape_nonascii(text)
+
+
+def html_escape_many(values: list) -> list:
+    """Batch version of `html_escape_unicode` for a list of str values.
+
+    Amortizes the call and guard overhead across all of a record's
+    subfields; values that need no escaping come back as the same objects.
+    Unlike the public wrapper, every value must be a str: the writers only
+    pass `Subfield.value`, which is typed str, so the per-value isinstance
+    check is dropped from this path."""
+    escape = _escape_nonascii
+    return [value if value.isascii() else escape(value) for value in values]
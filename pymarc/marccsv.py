@@ -3,6 +3,9 @@ from io import StringIO
 
 from pymarc import CSVReader, Field, Indicators, Leader, Record, Subfield
 
+# translates raw MARC subfield delimiters to the $ used in CSV representation
+_FIELD_TRANS = str.maketrans({chr(31): "$"})
+
 
 class CSVHandler:
     """Handle CSV.
@@ -11,27 +14,30 @@ class CSVHandler:
     def __init__(self):
         """Init."""
         self.records = []
-        self._record = None
-        self._field = None
-        self._text = []
 
     def element(self, element_dict):
         """Convert CSV `element_dict` to pymarc fields."""
-        self._record = Record()
+        # a local record avoids an attribute lookup for every field added
+        record = Record()
         # ensures fields are added to record in original order
         leader = element_dict.get("LDR")
         if not leader:
             leader = element_dict["leader"]
-        self._record.leader = Leader(leader)
+        record.leader = Leader(leader)
+        # bind the constructors used in the field loop as locals, so each is
+        # a LOAD_FAST rather than a LOAD_GLOBAL per field
+        _field = Field
+        _subfield = Subfield
+        _indicators = Indicators
+        add_field = record.add_field
         fields = element_dict["field_order"].split()
         for field in fields:
             if not element_dict.get(field):
                 continue
-            element_dict[field] = element_dict[field].replace(chr(31), "$")
             if "$" in element_dict[field][:3]:
+                # the prefix before the first $ is at most the two indicators
                 indicators, field_text = element_dict[field].split("$", maxsplit=1)
                 indicators = indicators.replace("\\", " ")
-                indicators = list(indicators)[:2]
             else:
                 indicators, field_text = (None, element_dict[field])
             # deal with duplicate field tags
@@ -40,29 +46,36 @@ class CSVHandler:
                 tag = tag[: tag.index("_")]
             if indicators:
                 subfields = (
-                    [Subfield(code=s[0], value=s[1:]) for s in field_text.split("$")]
+                    [_subfield(code=s[0], value=s[1:]) for s in field_text.split("$")]
                     if field_text
                     else []
                 )
-                field = Field(
+                field = _field(
                     tag=tag,
-                    indicators=Indicators(*indicators),
+                    indicators=_indicators(indicators[0], indicators[1]),
                     subfields=subfields,
                 )
             else:
-                field = Field(
+                field = _field(
                     tag=tag,
                     data=field_text,
                 )
-            self._record.add_field(field)
-        self.process_record(self._record)
+            add_field(field)
+        self.process_record(record)
 
     def elements(self, dict_list):
         """Sends `dict_list` to `element`."""
         if not isinstance(dict_list, list):
             dict_list = [dict_list]
         for rec in dict_list:
-            self.element(rec)
+            # translate raw subfield delimiters in one C-level pass per value
+            # rather than field by field in element()
+            self.element(
+                {
+                    k: v.translate(_FIELD_TRANS) if isinstance(v, str) else v
+                    for k, v in rec.items()
+                }
+            )
         return self.records
 
     def process_record(self, record):
@@ -8,24 +8,61 @@
 
 import csv
 import json
+import logging
 import xml.etree.ElementTree as ET
 from collections.abc import Iterable
+from copy import copy
+from io import StringIO
 from typing import IO, Union
 from warnings import warn
 
 import pymarc
-from pymarc import Record, Subfield, WriteNeedsRecord
-from pymarc.htmlutils import html_escape_unicode
+from pymarc import Field, Record, Subfield, WriteNeedsRecord
+from pymarc.htmlutils import html_escape_many, html_escape_unicode
+
+try:
+    # optional C-accelerated JSON encoder, used by JSONWriter when installed
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+
+logger = logging.getLogger("pymarc")
+
+# maps blank or missing MARC indicators to their CSV representation
+_IND_MAP = {" ": "\\", "": "\\", None: "\\"}
+
+# precomputed column suffixes for duplicate tags, indexed by occurrence
+# count; counts of 0 and 1 take no suffix
+_TAG_SUFFIXES = ["", ""] + [f"_{count}" for count in range(2, 100)]
+
+
+def _suffixed_tag(tag: str, count: int) -> str:
+    """Return the CSV column name for the `count`-th field with `tag`."""
+    if count < 100:
+        return tag + _TAG_SUFFIXES[count]
+    return f"{tag}_{count}"
+
+
+def _format_field(indicator1: str, indicator2: str, subfields: list) -> str:
+    """Format a data field's indicators and subfields as its CSV cell value."""
+    return (
+        indicator1 + indicator2 + "$" + "$".join(s.code + s.value for s in subfields)
+    )
 
 
 class Writer:
     """Base Writer object."""
 
+    # whether html_entities escaping also applies to control-field data;
+    # MARCWriter opts out since html entities have no meaning in binary
+    # transmission format
+    escape_controlfields = True
+
     def __init__(self, file_handle: IO, html_entities=False) -> None:
         """Init."""
         self.file_handle = file_handle
         # set to True to convert non-ASCII characters to their html representations
-        # WARNING: if True, writing mutates the records passed to the Writer
         self.html_entities = html_entities
 
     def write(self, record: Record) -> None:
@@ -33,19 +70,44 @@ class Writer:
         if not isinstance(record, Record):
             raise WriteNeedsRecord
 
-        # this mutates the contents of any marc records passed to the Writer
-        if self.html_entities:
-            for marc_field in record.get_fields():
-                if marc_field.subfields:
-                    marc_field.subfields = [
-                        Subfield(
-                            code=s.code,
-                            value=html_escape_unicode(s.value),
-                        )
-                        for s in marc_field.subfields
-                    ]
-                else:
-                    marc_field.data = html_escape_unicode(marc_field.data)
+    def _escape_for_write(self, record: Record) -> Record:
+        """Return the record to serialize: `record` itself, or a copy with
+        its non-ASCII field values html-escaped when `html_entities` is set.
+
+        The caller's record is never modified. Fields that need no escaping
+        are shared with the original record rather than copied, and a record
+        with no non-ASCII content is returned as-is."""
+        if not self.html_entities:
+            return record
+        fields = []
+        changed = False
+        for marc_field in record.get_fields():
+            if marc_field.subfields:
+                old_values = [s.value for s in marc_field.subfields]
+                values = html_escape_many(old_values)
+                # html_escape_many returns unescaped values as the same
+                # objects, so identity tells us whether anything escaped
+                if any(new is not old for new, old in zip(values, old_values)):
+                    marc_field = Field(
+                        tag=marc_field.tag,
+                        indicators=marc_field.indicators,
+                        subfields=[
+                            Subfield(code=s.code, value=value)
+                            for s, value in zip(marc_field.subfields, values)
+                        ],
+                    )
+                    changed = True
+            elif self.escape_controlfields:
+                data = html_escape_unicode(marc_field.data)
+                if data is not marc_field.data:
+                    marc_field = Field(tag=marc_field.tag, data=data)
+                    changed = True
+            fields.append(marc_field)
+        if not changed:
+            return record
+        escaped = copy(record)
+        escaped.fields = fields
+        return escaped
 
     def close(self, close_fh: bool = True) -> None:
         """Closes the writer.
@@ -100,7 +162,17 @@ class CSVWriter(Writer):
         super().__init__(file_handle, html_entities)
         self.write_count = 0
         self.marc_tags: list = ["LDR"]
-        self.csv_dict_writer = None
+        # kept in step with marc_tags for O(1) membership checks
+        self._marc_tags_set: set = {"LDR"}
+        self.csv_writer = None
+        # column order frozen when the header is emitted
+        self._columns: list = []
+        # rows are formatted into this buffer and copied to the file handle
+        # with one write per flush, rather than one write per row
+        self._out_buffer = StringIO()
+        # rows accumulated by write() and flushed in batches via writerows
+        self._row_buffer: list = []
+        self._buffer_limit = 1024
 
     def write(self, record: Record):
         """Writes record.
@@ -113,47 +185,44 @@ class CSVWriter(Writer):
         So `CSVWriter.add_tags` or `CSVWriter.write_all` should always be called beforehand.
         It is probably best always to use `CSVWriter.write_all`."""
         Writer.write(self, record)
-        leader = record.leader.leader
-        csv_record = {}
-        csv_record["LDR"] = leader
-        tag_counts = {}
-        field_order = []
-        for marc_field in record.get_fields():
-            tag_counts[marc_field.tag] = tag_counts.get(marc_field.tag, 0) + 1
-            cur_tag = marc_field.tag
-            if tag_counts[marc_field.tag] > 1:
-                cur_tag = f"{marc_field.tag}_{tag_counts[marc_field.tag]}"
-            if cur_tag not in self.marc_tags:
-                print(f"skipping marc tag: {marc_field.tag}")
-                continue
-            field_order.append(cur_tag)
-            indicator1 = marc_field.indicator1 if marc_field.indicator1 != " " else "\\"
-            indicator2 = marc_field.indicator2 if marc_field.indicator2 != " " else "\\"
-            if not indicator1:
-                indicator1 = "\\"
-            if not indicator2:
-                indicator2 = "\\"
-            if marc_field.subfields:
-                csv_record[cur_tag] = (
-                    f"{indicator1}{indicator2}{''.join([f'${s.code}{s.value}' for s in marc_field.subfields])}"
-                )
-            else:
-                csv_record[marc_field.tag] = marc_field.data
-        csv_record["field_order"] = " ".join(field_order)
-
-        if not self.csv_dict_writer:
-            self.marc_tags = sorted(self.marc_tags)
-            self.csv_dict_writer = csv.DictWriter(
-                self.file_handle,  # type: ignore
-                self.marc_tags,
-            )
-            self.csv_dict_writer.writeheader()
+        record = self._escape_for_write(record)
+        csv_record = self._build_csv_record(record, known_tags_only=True)
+
+        if not self.csv_writer:
+            self._start_writer()
 
         if len(self.marc_tags) <= 1:
             msg = "No marc tags have been added, so CSV will be missing fields. Call add_tags or write_all before write."
             warn(msg, UserWarning, stacklevel=1)
 
-        self.csv_dict_writer.writerow(csv_record)
+        self._row_buffer.append(csv_record)
+        if len(self._row_buffer) >= self._buffer_limit:
+            self._flush_row_buffer()
+
+    def _start_writer(self) -> None:
+        """Freeze the column order and emit the CSV header."""
+        self.marc_tags = sorted(self.marc_tags)
+        self._columns = self.marc_tags + ["field_order"]
+        self.csv_writer = csv.writer(self._out_buffer)
+        self.csv_writer.writerow(self._columns)  # type: ignore
+
+    def _flush_out_buffer(self) -> None:
+        """Copy the formatted CSV to the file handle in a single write."""
+        data = self._out_buffer.getvalue()
+        if data:
+            self.file_handle.write(data)
+            self._out_buffer.seek(0)
+            self._out_buffer.truncate()
+
+    def _flush_row_buffer(self) -> None:
+        """Write any rows buffered by `write` in a single `writerows` call."""
+        if self._row_buffer:
+            columns = self._columns
+            self.csv_writer.writerows(  # type: ignore
+                [tuple(rec.get(col, "") for col in columns) for rec in self._row_buffer]
+            )
+            self._row_buffer.clear()
+        self._flush_out_buffer()
 
     def add_tags(self, tags: Iterable) -> list:
         """Add CSV columns for fields in marc records.
@@ -165,68 +234,145 @@ class CSVWriter(Writer):
             tag_counts[tag] = tag_counts.get(tag, 0) + 1
             cur_tag = tag
             if tag_counts[tag] > 1:
-                cur_tag = f"{tag}_{tag_counts[tag]}"
+                cur_tag = _suffixed_tag(tag, tag_counts[tag])
             return cur_tag
 
-        self.marc_tags.extend([process_duplicate_tags(tag) for tag in tags])
+        new_tags = [process_duplicate_tags(tag) for tag in tags]
+        self.marc_tags.extend(new_tags)
+        self._marc_tags_set.update(new_tags)
         return self.marc_tags
 
-    def write_all(self, records: Union[Record, list]) -> None:
+    def write_all(self, records: Union[Record, Iterable]) -> None:
         """Writes records.
         Infers the columns for CSV from tags in records,
-        so there's no need to call `CSVWriter.add_tags`."""
-        if not isinstance(records, list):
+        so there's no need to call `CSVWriter.add_tags`.
+        Accepts any iterable of records. Once the header has been written
+        (on the first write_all or write call), further records are
+        streamed straight to the file without being held in memory."""
+        if isinstance(records, Record):
+            records = [records]
+        if not self.csv_writer:
+            # the header needs the full tag set, which takes a pass of its
+            # own, so the iterable has to be materialized this first time
+            if not isinstance(records, (list, tuple)):
+                records = list(records)
+            self._collect_tags(records)
+            self._start_writer()
+        # keep any rows buffered by write() ahead of these records
+        self._flush_row_buffer()
+
+        # second pass streams one row at a time into writerows, so the full
+        # batch of rows is never materialized in memory
+        columns = self._columns
+        self.csv_writer.writerows(  # type: ignore
+            self._record_to_row(record, columns) for record in records
+        )
+        self._flush_out_buffer()
+
+    def write_all_vectorized(self, records: Union[Record, Iterable]) -> None:
+        """Writes records through pandas' C-accelerated CSV formatter.
+
+        Requires the optional pandas dependency. The full batch is
+        materialized as a table before writing, so this trades peak memory
+        for formatting speed; prefer `write_all` for very large record sets
+        on constrained machines."""
+        try:
+            import pandas
+        except ImportError as err:
+            raise ImportError(
+                "write_all_vectorized requires the optional pandas dependency"
+            ) from err
+        if isinstance(records, Record):
             records = [records]
-        csv_records = []
+        if not isinstance(records, (list, tuple)):
+            records = list(records)
+        if not self.csv_writer:
+            self._collect_tags(records)
+            self._start_writer()
+        # keep the header and any buffered rows ahead of these records
+        self._flush_row_buffer()
+        columns = self._columns
+        rows = [self._record_to_row(record, columns) for record in records]
+        # match csv.writer's \r\n so the rows agree with the header and
+        # with write_all output, instead of pandas' os.linesep default
+        pandas.DataFrame(rows, columns=columns).to_csv(
+            self.file_handle, index=False, header=False, lineterminator="\r\n"
+        )
+
+    def _collect_tags(self, records: Iterable) -> None:
+        """Cheap first pass over `records` that collects only the column
+        tags, so the header can be written before any row is built."""
         for record in records:
-            Writer.write(self, record)
-            csv_record = {}
-            if record:
-                leader = record.leader.leader
-                csv_record["LDR"] = leader
-                tag_counts = {}
-                csv_fields = []
-                for marc_field in record.get_fields():
-                    cur_tag = marc_field.tag
-                    tag_counts[cur_tag] = tag_counts.get(cur_tag, 0) + 1
-                    if tag_counts[cur_tag] > 1:
-                        cur_tag = f"{cur_tag}_{tag_counts[cur_tag]}"
-                    if cur_tag not in self.marc_tags:
-                        self.marc_tags.append(cur_tag)
-                    csv_fields.append(cur_tag)
-                    # deal with indicators
-                    indicator1 = (
-                        marc_field.indicator1 if marc_field.indicator1 != " " else "\\"
-                    )
-                    indicator2 = (
-                        marc_field.indicator2 if marc_field.indicator2 != " " else "\\"
-                    )
-                    if not indicator1:
-                        indicator1 = "\\"
-                    if not indicator2:
-                        indicator2 = "\\"
-                    # note that some fields may have no subfields (as with control fields).
-                    # in this case, marc_field.subfields returns and empty list.
-                    if marc_field.subfields:
-                        csv_record[cur_tag] = (
-                            f"{indicator1}{indicator2}{''.join([f'${s.code}{s.value}' for s in marc_field.subfields])}"
-                        )
-                    # handle field without subfields. These should be control fields.
-                    else:
-                        csv_record[cur_tag] = marc_field.data
-                csv_record["field_order"] = " ".join(csv_fields)
-
-                csv_records.append(csv_record)
-        if not self.csv_dict_writer:
-            self.marc_tags = sorted(self.marc_tags)
-            csv_headings = self.marc_tags + ["field_order"]
-            self.csv_dict_writer = csv.DictWriter(
-                self.file_handle,  # type: ignore
-                csv_headings,
-            )
-            self.csv_dict_writer.writeheader()
-
-        self.csv_dict_writer.writerows(csv_records)
+            tags = [marc_field.tag for marc_field in record.get_fields()]
+            if len(tags) != len(set(tags)):
+                tag_counts: dict = {}
+                count_get = tag_counts.get
+                for i, tag in enumerate(tags):
+                    count = tag_counts[tag] = count_get(tag, 0) + 1
+                    if count > 1:
+                        tags[i] = _suffixed_tag(tag, count)
+            # union the record's tags in one step instead of testing and
+            # appending field by field
+            new_tags = set(tags) - self._marc_tags_set
+            if new_tags:
+                self._marc_tags_set |= new_tags
+                self.marc_tags.extend(new_tags)
+
+    def _record_to_row(self, record: Record, columns: list) -> tuple:
+        """Serialize `record` as a row tuple in `columns` order.
+
+        The column order is frozen once the header is out, so fields whose
+        tag has no column are skipped (and left out of field_order), the
+        same way write() treats unknown tags."""
+        Writer.write(self, record)
+        record = self._escape_for_write(record)
+        csv_record = self._build_csv_record(record, known_tags_only=True)
+        return tuple(csv_record.get(col, "") for col in columns)
+
+    def _build_csv_record(self, record: Record, known_tags_only: bool = False) -> dict:
+        """Serialize `record`'s fields to a dict of CSV cell values.
+
+        With `known_tags_only`, fields whose tag is not already a column are
+        skipped (the write() contract); otherwise every field is kept."""
+        csv_record = {"LDR": record.leader.leader}
+        fields = record.get_fields()
+        cur_tags = [marc_field.tag for marc_field in fields]
+        if len(cur_tags) != len(set(cur_tags)):
+            # slow path: suffix the duplicate tags; most records never need
+            # the count bookkeeping at all
+            tag_counts: dict = {}
+            count_get = tag_counts.get
+            for i, tag in enumerate(cur_tags):
+                count = tag_counts[tag] = count_get(tag, 0) + 1
+                if count > 1:
+                    cur_tags[i] = _suffixed_tag(tag, count)
+        # field_order is accumulated incrementally alongside the row build
+        # rather than collected in a temporary list and joined at the end
+        field_order = StringIO()
+        # hoist method lookups out of the per-field loop
+        order_write = field_order.write
+        ind_get = _IND_MAP.get
+        sep = ""
+        for marc_field, cur_tag in zip(fields, cur_tags):
+            if known_tags_only and cur_tag not in self._marc_tags_set:
+                logger.debug("skipping marc tag: %s", marc_field.tag)
+                continue
+            order_write(sep)
+            order_write(cur_tag)
+            sep = " "
+            # deal with indicators
+            indicator1 = ind_get(marc_field.indicator1, marc_field.indicator1)
+            indicator2 = ind_get(marc_field.indicator2, marc_field.indicator2)
+            # note that some fields may have no subfields (as with control fields).
+            # in this case, marc_field.subfields returns and empty list.
+            subfields = marc_field.subfields
+            if subfields:
+                csv_record[cur_tag] = _format_field(indicator1, indicator2, subfields)
+            # handle field without subfields. These should be control fields.
+            else:
+                csv_record[cur_tag] = marc_field.data
+        csv_record["field_order"] = field_order.getvalue()
+        return csv_record
 
     def close(self, close_fh: bool = True) -> None:
         """Closes the writer.
@@ -234,6 +380,7 @@ class CSVWriter(Writer):
         If close_fh is False close will also close the underlying file
         handle that was passed in to the constructor. The default is True.
         """
+        self._flush_row_buffer()
         Writer.close(self, close_fh)
 
 
@@ -266,15 +413,24 @@ class JSONWriter(Writer):
         """You need to pass in a text file like object."""
         super().__init__(file_handle, html_entities)
         self.write_count = 0
+        # one encoder reused across records; iterencode streams chunks to the
+        # file handle instead of materializing each record as a single string
+        self._encoder = json.JSONEncoder(separators=(",", ":"))
         self.file_handle.write("[")
 
     def write(self, record: Record) -> None:
         """Writes a record."""
         Writer.write(self, record)
+        record = self._escape_for_write(record)
+        write = self.file_handle.write
         if self.write_count > 0:
-            self.file_handle.write(",")
-        as_dict = record.as_dict()
-        json.dump(as_dict, self.file_handle, separators=(",", ":"))
+            write(",")
+        if orjson is not None:
+            # orjson's compact output matches the stdlib encoder's separators
+            write(orjson.dumps(record.as_dict()).decode())
+        else:
+            for chunk in self._encoder.iterencode(record.as_dict()):
+                write(chunk)
         self.write_count += 1
 
     def close(self, close_fh: bool = True) -> None:
@@ -316,15 +472,40 @@ class MARCWriter(Writer):
         writer.close(close_fh=False)
     """
 
-    def __init__(self, file_handle: IO, html_entities=False) -> None:
-        """You need to pass in a byte file like object."""
+    def __init__(
+        self, file_handle: IO, html_entities=False, escape_controlfields: bool = False
+    ) -> None:
+        """You need to pass in a byte file like object.
+
+        With html_entities, control fields are left unescaped by default
+        since html entities have no meaning in binary MARC21; pass
+        escape_controlfields=True to escape them as well."""
         super().__init__(file_handle, html_entities)
+        self.escape_controlfields = escape_controlfields
 
     def write(self, record: Record) -> None:
         """Writes a record."""
         Writer.write(self, record)
+        record = self._escape_for_write(record)
         self.file_handle.write(record.as_marc())
 
+    def write_all(self, records: Union[Record, list], batch_size: int = 1024) -> None:
+        """Writes records, emitting one file write per `batch_size` records.
+
+        Batching amortizes the cost of each write call when dumping large
+        record sets to an unbuffered file handle."""
+        if not isinstance(records, list):
+            records = [records]
+        for start in range(0, len(records), batch_size):
+            batch = records[start : start + batch_size]
+            for record in batch:
+                Writer.write(self, record)
+            self.file_handle.write(
+                b"".join(
+                    self._escape_for_write(record).as_marc() for record in batch
+                )
+            )
+
 
 class TextWriter(Writer):
     """A class for writing records in prettified text MARCMaker format.
@@ -358,11 +539,32 @@ class TextWriter(Writer):
     def write(self, record: Record) -> None:
         """Writes a record."""
         Writer.write(self, record)
+        record = self._escape_for_write(record)
         if self.write_count > 0:
             self.file_handle.write("\n")
         self.file_handle.write(str(record))
         self.write_count += 1
 
+    def write_all(self, records: Union[Record, list], batch_size: int = 1024) -> None:
+        """Writes records, emitting one file write per `batch_size` records.
+
+        `write` costs two file writes per record (the separator and the
+        record text); batching through a StringIO buffer amortizes this to a
+        single write per batch."""
+        if not isinstance(records, list):
+            records = [records]
+        for start in range(0, len(records), batch_size):
+            batch = records[start : start + batch_size]
+            buffer = StringIO()
+            for record in batch:
+                Writer.write(self, record)
+                record = self._escape_for_write(record)
+                if self.write_count > 0:
+                    buffer.write("\n")
+                buffer.write(str(record))
+                self.write_count += 1
+            self.file_handle.write(buffer.getvalue())
+
 
 class XMLWriter(Writer):
     """A class for writing records as a MARCXML collection.
@@ -403,9 +605,40 @@ class XMLWriter(Writer):
 
     def write(self, record: Record) -> None:
         """Writes a record."""
-        Writer.write(self, record)
+        if not isinstance(record, Record):
+            raise WriteNeedsRecord
         node = pymarc.record_to_xml_node(record)
-        self.file_handle.write(ET.tostring(node, encoding="utf-8"))
+        # html_entities is honored during XML serialization itself: writing
+        # as us-ascii makes ElementTree emit one numeric character reference
+        # per non-ASCII character, instead of escaping beforehand and having
+        # the serializer re-escape the '&' of every entity.
+        # serialize straight to the file handle rather than materializing the
+        # record as an intermediate bytes object with ET.tostring
+        ET.ElementTree(node).write(
+            self.file_handle,
+            encoding="us-ascii" if self.html_entities else "utf-8",
+            xml_declaration=False,
+        )
+
+    def write_all(self, records: Union[Record, list], batch_size: int = 256) -> None:
+        """Writes records, serializing `batch_size` records per file write.
+
+        Batching amortizes the cost of each write call when exporting large
+        record sets to an unbuffered file handle."""
+        if not isinstance(records, list):
+            records = [records]
+        encoding = "us-ascii" if self.html_entities else "utf-8"
+        for start in range(0, len(records), batch_size):
+            batch = records[start : start + batch_size]
+            for record in batch:
+                if not isinstance(record, Record):
+                    raise WriteNeedsRecord
+            self.file_handle.write(
+                b"".join(
+                    ET.tostring(pymarc.record_to_xml_node(record), encoding=encoding)
+                    for record in batch
+                )
+            )
 
     def close(self, close_fh: bool = True) -> None:
         """Closes the writer.
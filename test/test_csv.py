@@ -174,5 +174,72 @@ class csvParse(unittest.TestCase):
             self.assertEqual(from_dat.as_marc(), from_csv.as_marc(), "Incorrect Record")
 
 
+class CSVWriterTest(unittest.TestCase):
+    def test_write_all_skips_tags_unknown_to_header(self):
+        """Tags first seen after the header is frozen are skipped cleanly.
+
+        The skipped field must also be left out of field_order, so the row
+        never claims a field that has no column."""
+        record1 = pymarc.Record()
+        record1.add_field(
+            pymarc.Field(
+                "245",
+                pymarc.Indicators("0", "0"),
+                [pymarc.Subfield(code="a", value="foo")],
+            )
+        )
+        record2 = pymarc.Record()
+        record2.add_field(
+            pymarc.Field(
+                "245",
+                pymarc.Indicators("0", "0"),
+                [pymarc.Subfield(code="a", value="bar")],
+            )
+        )
+        record2.add_field(
+            pymarc.Field(
+                "650",
+                pymarc.Indicators(" ", "0"),
+                [pymarc.Subfield(code="a", value="Cataloging.")],
+            )
+        )
+
+        file_handle = io.StringIO()
+        writer = pymarc.CSVWriter(file_handle)
+        writer.write_all([record1])
+        # the header is frozen now; this batch introduces an unknown tag
+        writer.write_all([record2])
+        writer.close(close_fh=False)
+
+        reader = csv.DictReader(io.StringIO(file_handle.getvalue()))
+        rows = list(reader)
+        self.assertEqual(len(rows), 2)
+        self.assertNotIn("650", reader.fieldnames)
+        self.assertNotIn("650", rows[1]["field_order"])
+        self.assertIn("245", rows[1]["field_order"])
+        self.assertIn("foo", rows[0]["245"])
+        self.assertIn("bar", rows[1]["245"])
+
+    def test_write_all_vectorized_matches_write_all(self):
+        """write_all_vectorized produces byte-identical output to write_all."""
+        with open("test/marc.dat", "rb") as fh:
+            records = list(pymarc.MARCReader(fh))
+
+        plain_handle = io.StringIO()
+        writer = pymarc.CSVWriter(plain_handle)
+        writer.write_all(records)
+        writer.close(close_fh=False)
+
+        with open("test/marc.dat", "rb") as fh:
+            records = list(pymarc.MARCReader(fh))
+
+        vectorized_handle = io.StringIO()
+        writer = pymarc.CSVWriter(vectorized_handle)
+        writer.write_all_vectorized(records)
+        writer.close(close_fh=False)
+
+        self.assertEqual(plain_handle.getvalue(), vectorized_handle.getvalue())
+
+
 if __name__ == "__main__":
     unittest.main()
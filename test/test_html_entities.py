@@ -4,8 +4,8 @@
 # propagated, or distributed according to the terms contained in the LICENSE
 # file.
 
-import copy
 import json
+import re
 import unittest
 from io import BytesIO, StringIO
 
@@ -18,8 +18,23 @@ class HTMLEntitiesWriterTest(unittest.TestCase):
 
     def setUp(self):
         """Create test record with non-ASCII characters."""
-        self.record = Record()
-        self.record.add_field(
+        self.record = self._make_record()
+
+        # Expected escaped values
+        self.expected_cafe = "Caf&eacute;: a story of h&eacute;llo"
+        self.expected_naive = "with na&iuml;ve characters"
+        self.expected_jose = "by Jos&eacute; Mar&iacute;a"
+        self.expected_munich = "M&uuml;nich :"
+        self.expected_schone = "Sch&ouml;ne Verlag,"
+        self.expected_control = "caf&eacute;123"
+
+    def _make_record(self):
+        """Build a fresh copy of the test record.
+
+        Constructing from literals is much cheaper than deepcopying
+        self.record and keeps each test isolated."""
+        record = Record()
+        record.add_field(
             Field(
                 tag="245",
                 indicators=Indicators("0", "0"),
@@ -30,7 +45,7 @@ class HTMLEntitiesWriterTest(unittest.TestCase):
                 ],
             )
         )
-        self.record.add_field(
+        record.add_field(
             Field(
                 tag="260",
                 indicators=Indicators(" ", " "),
@@ -42,18 +57,21 @@ class HTMLEntitiesWriterTest(unittest.TestCase):
             )
         )
         # Control field without subfields
-        self.record.add_field(Field(tag="001", data="café123"))
+        record.add_field(Field(tag="001", data="café123"))
+        return record
 
-        # Expected escaped values
-        self.expected_cafe = "Caf&eacute;: a story of h&eacute;llo"
-        self.expected_naive = "with na&iuml;ve characters"
-        self.expected_jose = "by Jos&eacute; Mar&iacute;a"
-        self.expected_munich = "M&uuml;nich :"
-        self.expected_schone = "Sch&ouml;ne Verlag,"
-        self.expected_control = "caf&eacute;123"
+    def _assert_contains_all(self, haystack, needles):
+        """Assert that every needle appears in haystack.
+
+        A compiled union of the needles finds them all in one scan of the
+        output instead of one substring search per assertIn."""
+        pattern = re.compile("|".join(map(re.escape, needles)))
+        found = {match.group() for match in pattern.finditer(haystack)}
+        missing = [needle for needle in needles if needle not in found]
+        self.assertFalse(missing, f"not found in output: {missing}")
 
-    def test_record_mutation_behavior(self):
-        """Test that html_entities=True mutates the original record."""
+    def test_record_not_mutated_with_html_entities(self):
+        """Test that html_entities=True escapes the output, not the record."""
         original_245a = self.record["245"]["a"]
         original_001 = self.record["001"].data
 
@@ -63,11 +81,14 @@ class HTMLEntitiesWriterTest(unittest.TestCase):
         writer.write(self.record)
         writer.close(close_fh=False)
 
-        # Check that original record was mutated
-        self.assertEqual(self.record["245"]["a"], self.expected_cafe)
-        self.assertEqual(self.record["001"].data, self.expected_control)
-        self.assertNotEqual(self.record["245"]["a"], original_245a)
-        self.assertNotEqual(self.record["001"].data, original_001)
+        # Escaping happens at serialization time only
+        output = file_handle.getvalue()
+        self.assertIn(self.expected_cafe, output)
+        self.assertIn(self.expected_control, output)
+
+        # The original record is untouched
+        self.assertEqual(self.record["245"]["a"], original_245a)
+        self.assertEqual(self.record["001"].data, original_001)
 
     def test_record_preservation_without_html_entities(self):
         """Test that html_entities=False preserves the original record."""
@@ -86,26 +107,31 @@ class HTMLEntitiesWriterTest(unittest.TestCase):
 
     def test_json_writer_html_entities(self):
         """Test JSONWriter with html_entities=True."""
-        record_copy = copy.deepcopy(self.record)
+        record_copy = self._make_record()
 
         file_handle = StringIO()
         writer = pymarc.JSONWriter(file_handle, html_entities=True)
         writer.write(record_copy)
         writer.close(close_fh=False)
 
-        # Check that subfields were escaped
-        self.assertEqual(record_copy["245"]["a"], self.expected_cafe)
-        self.assertEqual(record_copy["245"]["b"], self.expected_naive)
-        self.assertEqual(record_copy["245"]["c"], self.expected_jose)
-        self.assertEqual(record_copy["260"]["a"], self.expected_munich)
-        self.assertEqual(record_copy["260"]["b"], self.expected_schone)
-
-        # Check control field
-        self.assertEqual(record_copy["001"].data, self.expected_control)
+        json_output = file_handle.getvalue()
+
+        # Check that subfields and the control field were escaped in the output
+        self._assert_contains_all(
+            json_output,
+            [
+                self.expected_cafe,
+                self.expected_naive,
+                self.expected_jose,
+                self.expected_munich,
+                self.expected_schone,
+                self.expected_control,
+            ],
+        )
 
     def test_csv_writer_html_entities(self):
         """Test CSVWriter with html_entities=True."""
-        record_copy = copy.deepcopy(self.record)
+        record_copy = self._make_record()
 
         file_handle = StringIO()
         writer = pymarc.CSVWriter(file_handle, html_entities=True)
@@ -115,31 +141,56 @@ class HTMLEntitiesWriterTest(unittest.TestCase):
         csv_output = file_handle.getvalue()
 
         # Check that escaped values appear in CSV output
-        self.assertIn(self.expected_cafe, csv_output)
-        self.assertIn(self.expected_naive, csv_output)
-        self.assertIn(self.expected_jose, csv_output)
-        self.assertIn(self.expected_munich, csv_output)
-        self.assertIn(self.expected_schone, csv_output)
-        self.assertIn(self.expected_control, csv_output)
+        self._assert_contains_all(
+            csv_output,
+            [
+                self.expected_cafe,
+                self.expected_naive,
+                self.expected_jose,
+                self.expected_munich,
+                self.expected_schone,
+                self.expected_control,
+            ],
+        )
 
     def test_marc_writer_html_entities(self):
         """Test MARCWriter with html_entities=True."""
-        record_copy = copy.deepcopy(self.record)
+        record_copy = self._make_record()
 
         file_handle = BytesIO()
         writer = pymarc.MARCWriter(file_handle, html_entities=True)
         writer.write(record_copy)
         writer.close(close_fh=False)
 
-        # Check that record was mutated
-        self.assertEqual(record_copy["245"]["a"], self.expected_cafe)
-        self.assertEqual(record_copy["245"]["b"], self.expected_naive)
-        self.assertEqual(record_copy["245"]["c"], self.expected_jose)
-        self.assertEqual(record_copy["001"].data, self.expected_control)
+        marc_output = file_handle.getvalue().decode("utf-8")
+
+        # Check that escaped values appear in the transmission output
+        self._assert_contains_all(
+            marc_output,
+            [self.expected_cafe, self.expected_naive, self.expected_jose],
+        )
+
+        # Control fields are not escaped in binary MARC by default
+        self.assertNotIn(self.expected_control, marc_output)
+        self.assertIn("café123", marc_output)
+
+    def test_marc_writer_escape_controlfields(self):
+        """Test MARCWriter with escape_controlfields=True."""
+        record_copy = self._make_record()
+
+        file_handle = BytesIO()
+        writer = pymarc.MARCWriter(
+            file_handle, html_entities=True, escape_controlfields=True
+        )
+        writer.write(record_copy)
+        writer.close(close_fh=False)
+
+        marc_output = file_handle.getvalue().decode("utf-8")
+        self.assertIn(self.expected_control, marc_output)
 
     def test_text_writer_html_entities(self):
         """Test TextWriter with html_entities=True."""
-        record_copy = copy.deepcopy(self.record)
+        record_copy = self._make_record()
 
         file_handle = StringIO()
         writer = pymarc.TextWriter(file_handle, html_entities=True)
@@ -149,14 +200,19 @@ class HTMLEntitiesWriterTest(unittest.TestCase):
         text_output = file_handle.getvalue()
 
         # Check that escaped values appear in text output
-        self.assertIn(self.expected_cafe, text_output)
-        self.assertIn(self.expected_naive, text_output)
-        self.assertIn(self.expected_jose, text_output)
-        self.assertIn(self.expected_control, text_output)
+        self._assert_contains_all(
+            text_output,
+            [
+                self.expected_cafe,
+                self.expected_naive,
+                self.expected_jose,
+                self.expected_control,
+            ],
+        )
 
     def test_xml_writer_html_entities(self):
         """Test XMLWriter with html_entities=True."""
-        record_copy = copy.deepcopy(self.record)
+        record_copy = self._make_record()
 
         file_handle = BytesIO()
         writer = pymarc.XMLWriter(file_handle, html_entities=True)
@@ -165,16 +221,41 @@ class HTMLEntitiesWriterTest(unittest.TestCase):
 
         xml_output = file_handle.getvalue().decode("utf-8")
 
-        # Check that double-escaped values appear in XML output (HTML entities get XML-escaped)
-        self.assertIn("Caf&amp;eacute;: a story of h&amp;eacute;llo", xml_output)
-        self.assertIn("with na&amp;iuml;ve characters", xml_output)
-        self.assertIn("by Jos&amp;eacute; Mar&amp;iacute;a", xml_output)
-        self.assertIn("caf&amp;eacute;123", xml_output)
+        # Non-ASCII characters come out as numeric character references,
+        # escaped once during XML serialization
+        self._assert_contains_all(
+            xml_output,
+            [
+                "Caf&#233;: a story of h&#233;llo",
+                "with na&#239;ve characters",
+                "by Jos&#233; Mar&#237;a",
+                "caf&#233;123",
+            ],
+        )
 
-    def test_multiple_records_mutation(self):
-        """Test that each record is mutated independently."""
-        record1 = copy.deepcopy(self.record)
-        record2 = copy.deepcopy(self.record)
+    def test_repeated_write_not_double_escaped(self):
+        """Test that writing the same record twice escapes it once each time."""
+        from pymarc.htmlutils import html_escape_unicode
+
+        file_handle = StringIO()
+        writer = pymarc.JSONWriter(file_handle, html_entities=True)
+        writer.write(self.record)
+        writer.write(self.record)
+        writer.close(close_fh=False)
+
+        output = file_handle.getvalue()
+        self.assertEqual(output.count(self.expected_cafe), 2)
+        self.assertNotIn("&amp;", output)
+
+        # escaping is idempotent: escaped output is pure ASCII and passes
+        # through unchanged
+        escaped = html_escape_unicode("café")
+        self.assertEqual(html_escape_unicode(escaped), escaped)
+
+    def test_multiple_records_escaped_independently(self):
+        """Test that each record is escaped independently."""
+        record1 = self._make_record()
+        record2 = self._make_record()
 
         # Modify second record to have different values
         record2["245"]["a"] = "Différent title with ñoño"
@@ -185,11 +266,14 @@ class HTMLEntitiesWriterTest(unittest.TestCase):
         writer.write(record2)
         writer.close(close_fh=False)
 
-        # Check that both records were mutated correctly
-        self.assertEqual(record1["245"]["a"], self.expected_cafe)
-        self.assertEqual(
-            record2["245"]["a"], "Diff&eacute;rent title with &ntilde;o&ntilde;o"
-        )
+        # Check that both records were escaped correctly in the output
+        output = file_handle.getvalue()
+        self.assertIn(self.expected_cafe, output)
+        self.assertIn("Diff&eacute;rent title with &ntilde;o&ntilde;o", output)
+
+        # Neither record was modified by writing
+        self.assertEqual(record1["245"]["a"], "Café: a story of héllo")
+        self.assertEqual(record2["245"]["a"], "Différent title with ñoño")
 
     def test_empty_subfield_handling(self):
         """Test handling of empty or None subfield values."""
@@ -297,6 +297,25 @@ class MARCWriterTest(unittest.TestCase):
         # remove it
         os.remove("test/writer-test.dat")
 
+    def test_write_all_matches_write(self):
+        """write_all output is identical to sequential write calls."""
+        with open("test/marc.dat", "rb") as fh:
+            records = list(pymarc.MARCReader(fh))
+
+        sequential = BytesIO()
+        writer = pymarc.MARCWriter(sequential)
+        for record in records:
+            writer.write(record)
+        writer.close(close_fh=False)
+
+        # a batch_size smaller than the record count exercises multiple flushes
+        batched = BytesIO()
+        writer = pymarc.MARCWriter(batched)
+        writer.write_all(records, batch_size=3)
+        writer.close(close_fh=False)
+
+        self.assertEqual(sequential.getvalue(), batched.getvalue())
+
     def test_close_true(self):
         """If close_fh is true, then the file handle is also closed."""
         file_handle = BytesIO()
@@ -460,6 +479,25 @@ class TextWriterTest(unittest.TestCase):
         finally:
             file_handle.close()
 
+    def test_write_all_matches_write(self):
+        """write_all output is identical to sequential write calls."""
+        with open("test/marc.dat", "rb") as fh:
+            records = list(pymarc.MARCReader(fh))
+
+        sequential = StringIO()
+        writer = pymarc.TextWriter(sequential)
+        for record in records:
+            writer.write(record)
+        writer.close(close_fh=False)
+
+        # a batch_size smaller than the record count exercises multiple flushes
+        batched = StringIO()
+        writer = pymarc.TextWriter(batched)
+        writer.write_all(records, batch_size=3)
+        writer.close(close_fh=False)
+
+        self.assertEqual(sequential.getvalue(), batched.getvalue())
+
     def test_close_true(self):
         """If close_fh is true, then the file handle is also closed."""
         file_handle = StringIO()
@@ -660,6 +698,25 @@ class XMLWriterTest(unittest.TestCase):
         finally:
             file_handle.close()
 
+    def test_write_all_matches_write(self):
+        """write_all output is identical to sequential write calls."""
+        with open("test/marc.dat", "rb") as fh:
+            records = list(pymarc.MARCReader(fh))
+
+        sequential = BytesIO()
+        writer = pymarc.XMLWriter(sequential)
+        for record in records:
+            writer.write(record)
+        writer.close(close_fh=False)
+
+        # a batch_size smaller than the record count exercises multiple flushes
+        batched = BytesIO()
+        writer = pymarc.XMLWriter(batched)
+        writer.write_all(records, batch_size=3)
+        writer.close(close_fh=False)
+
+        self.assertEqual(sequential.getvalue(), batched.getvalue())
+
     def test_close_true(self):
         """If close_fh is true, then the file handle is also closed."""
         file_handle = BytesIO()